@@ -3,7 +3,16 @@ from PIL import Image, ImageDraw, ImageFont
 import torch
 import numpy as np
 import random
+import json
 from .text_overlay import TextOverlay
+from .line_breaking import LINE_BREAKING_MODES, wrap_words
+from .render_cache import render_cache
+from .async_pipeline import overlay_executor, resolve
+from .cache_registry import cache_registry
+from .fonts import load_truetype
+from .shaping import shaped_runs
+from .process_pool import render_batch
+from .tiling import TILING_MODES, use_tiling, union_bbox, tile_region, crop_to_pil, paste_region
 from .test_node import TestNode
 
 class AnyType(str):
@@ -183,6 +192,47 @@ class BookToolsEndQueue:
             interrupt_processing()
         return ()
 
+class BookToolsCacheControl:
+    """
+    Reports the font, measurement, layout and render caches and optionally clears them.
+    Place it at the end of a job to release cache memory before the next one.
+    """
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {
+            "clear": ("BOOLEAN", {"default": False}),
+            "budget_mb": ("INT", {"default": 0, "min": 0, "max": 65536, "step": 64}),
+            },
+            "optional": {"trigger": (any,)}
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("stats",)
+    FUNCTION = "main"
+    CATEGORY = "logic"
+    OUTPUT_NODE = True
+
+    def main(self, clear, budget_mb, trigger=None):
+        """
+        Parameters:
+        - clear (bool): Empty all caches after taking the snapshot.
+        - budget_mb (int): New total cache budget in MB, 0 keeps the current one.
+        - trigger: Any value, only used to order this node after others in the graph.
+
+        Returns:
+        - str: JSON snapshot of every cache taken before clearing.
+        """
+        if budget_mb > 0:
+            cache_registry.set_budget(budget_mb * 1024 * 1024)
+        stats = json.dumps(cache_registry.stats(), indent=2)
+        if clear:
+            cache_registry.clear()
+        return (stats,)
+
+    @classmethod
+    def IS_CHANGED(self, clear, budget_mb, trigger=None):
+        return float("NaN")
+
 class BookToolsDownloadFont:
     # Known working fonts from Google Fonts
     SUPPORTED_FONTS = {
@@ -298,6 +348,10 @@ class BookToolsImageTextOverlay:
                 "start_y": ("INT", {"default": 0}),
                 "padding": ("INT", {"default": 50}),
                 "line_height_factor": ("FLOAT", {"default": 1.2, "min": 0.5, "max": 3.0, "step": 0.1}),
+            },
+            "optional": {
+                "line_breaking": (LINE_BREAKING_MODES, {"default": "greedy"}),
+                "use_cache": ("BOOLEAN", {"default": False}),
             }
         }
 
@@ -305,20 +359,28 @@ class BookToolsImageTextOverlay:
     FUNCTION = "add_text_overlay"
     CATEGORY = "image/text"
 
-    def calculate_text_size(self, text, font_size, font_path, max_width, max_height):
-        font = ImageFont.truetype(font_path, font_size)
+    def calculate_text_size(self, text, font_size, font_path, max_width, max_height, line_breaking="greedy"):
+        font = load_truetype(font_path, font_size)
         paragraphs = text.split('\n')
         lines = []
         
         for paragraph in paragraphs:
             words = paragraph.split()
+            if line_breaking == "optimal":
+                word_widths = []
+                for word in words:
+                    word_bbox = shaped_runs.text_bbox(font, word)
+                    word_widths.append(word_bbox[2] - word_bbox[0])
+                lines.extend(wrap_words(words, word_widths, shaped_runs.text_bbox(font, ' ')[2], max_width))
+                continue
+
             current_line = []
             current_width = 0
 
             for word in words:
-                word_bbox = font.getbbox(word)
+                word_bbox = shaped_runs.text_bbox(font, word)
                 word_width = word_bbox[2] - word_bbox[0]
-                space_width = font.getbbox(' ')[2] if current_line else 0
+                space_width = shaped_runs.text_bbox(font, ' ')[2] if current_line else 0
                 
                 if current_width + word_width + space_width <= max_width:
                     current_line.append(word)
@@ -336,10 +398,27 @@ class BookToolsImageTextOverlay:
         return lines, total_height <= max_height
 
     def add_text_overlay(self, image, text, textbox_width, textbox_height, max_font_size, min_font_size, 
-                        font, alignment, color, start_x, start_y, padding, line_height_factor):
+                        font, alignment, color, start_x, start_y, padding, line_height_factor, line_breaking="greedy",
+                        use_cache=False):
+        if use_cache:
+            params = {k: v for k, v in locals().items() if k not in ("self", "image", "use_cache")}
+            return render_cache.cached("ImageTextOverlay", image, params, lambda: self.add_text_overlay(image, **params))
+
         image_tensor = image
         image_np = image_tensor.cpu().numpy()
         image_pil = Image.fromarray((image_np.squeeze(0) * 255).astype(np.uint8))
+        draw = ImageDraw.Draw(image_pil)
+
+        self.draw_text_box(draw, text, textbox_width, textbox_height, max_font_size, min_font_size,
+                           font, alignment, color, start_x, start_y, padding, line_height_factor, line_breaking)
+
+        image_tensor_out = torch.tensor(np.array(image_pil).astype(np.float32) / 255.0)
+        image_tensor_out = torch.unsqueeze(image_tensor_out, 0)
+        return (image_tensor_out,)
+
+    def draw_text_box(self, draw, text, textbox_width, textbox_height, max_font_size, min_font_size,
+                      font, alignment, color, start_x, start_y, padding, line_height_factor, line_breaking="greedy"):
+        """Fits text into the textbox with the largest possible font size and draws it"""
         color_rgb = tuple(int(color.lstrip("#")[i:i+2], 16) for i in (0, 2, 4))
 
         effective_width = textbox_width - 2 * padding
@@ -352,7 +431,7 @@ class BookToolsImageTextOverlay:
 
         while low <= high:
             mid = (low + high) // 2
-            lines, fits = self.calculate_text_size(text, mid, font, effective_width, effective_height)
+            lines, fits = self.calculate_text_size(text, mid, font, effective_width, effective_height, line_breaking)
             
             if fits:
                 optimal_font_size = mid
@@ -364,11 +443,10 @@ class BookToolsImageTextOverlay:
         # If no fitting size was found, use min_font_size
         if not optimal_lines:
             optimal_font_size = min_font_size
-            optimal_lines, _ = self.calculate_text_size(text, min_font_size, font, effective_width, effective_height)
+            optimal_lines, _ = self.calculate_text_size(text, min_font_size, font, effective_width, effective_height, line_breaking)
 
         # Render the text with the optimal font size
-        loaded_font = ImageFont.truetype(font, optimal_font_size)
-        draw = ImageDraw.Draw(image_pil)
+        loaded_font = load_truetype(font, optimal_font_size)
         
         line_height = int(optimal_font_size * line_height_factor)
         total_text_height = len(optimal_lines) * line_height
@@ -383,7 +461,7 @@ class BookToolsImageTextOverlay:
             if y + line_height > start_y + textbox_height:  # Skip lines that would be completely outside the box
                 break
 
-            line_bbox = loaded_font.getbbox(line)
+            line_bbox = shaped_runs.text_bbox(loaded_font, line)
             line_width = line_bbox[2] - line_bbox[0]
 
             if alignment == "left":
@@ -393,11 +471,104 @@ class BookToolsImageTextOverlay:
             else:  # center
                 x = start_x + padding + (effective_width - line_width) // 2
 
-            draw.text((x, y), line, fill=color_rgb, font=loaded_font)
+            shaped_runs.draw_text(draw, (x, y), line, fill=color_rgb, font=loaded_font)
             y += line_height
 
-        image_tensor_out = torch.tensor(np.array(image_pil).astype(np.float32) / 255.0)
-        image_tensor_out = torch.unsqueeze(image_tensor_out, 0)
+class BookToolsMultiBoxTextOverlay(BookToolsImageTextOverlay):
+    """
+    Draws several text boxes onto one page in a single pass.
+
+    Every box is laid out exactly like the Image Text Overlay node, but the image is
+    converted to PIL once, only for the region covered by the boxes, and written back
+    with a single copy instead of one full-frame round-trip per box.
+    """
+    BOX_DEFAULTS = {
+        "text": "",
+        "x": 0,
+        "y": 0,
+        "width": 200,
+        "height": 200,
+        "max_font_size": 80,
+        "min_font_size": 12,
+        "font": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "alignment": "center",
+        "color": "#000000",
+        "padding": 50,
+        "line_height_factor": 1.2,
+        "line_breaking": "greedy",
+    }
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image": ("IMAGE",),
+                "boxes": ("STRING", {"multiline": True, "default": '[{"text": "Hello", "x": 0, "y": 0, "width": 200, "height": 200}]'}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "add_text_boxes"
+    CATEGORY = "image/text"
+
+    def parse_boxes(self, boxes):
+        """
+        Parses the JSON box list and fills in defaults for missing keys.
+
+        Parameters:
+        - boxes (str): JSON list of box objects, see BOX_DEFAULTS for the accepted keys.
+
+        Returns:
+        - list: One complete box dict per entry.
+        """
+        try:
+            specs = json.loads(boxes) if boxes.strip() else []
+        except json.JSONDecodeError as e:
+            raise ValueError(f"boxes must be a JSON list: {e}")
+        if isinstance(specs, dict):
+            specs = [specs]
+        if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+            raise ValueError("boxes must be a JSON list of objects.")
+
+        parsed = []
+        for spec in specs:
+            unknown = set(spec) - set(self.BOX_DEFAULTS)
+            if unknown:
+                raise ValueError(f"Unknown box keys: {', '.join(sorted(unknown))}")
+            parsed.append({**self.BOX_DEFAULTS, **spec})
+        return parsed
+
+    def add_text_boxes(self, image, boxes):
+        boxes = [box for box in self.parse_boxes(boxes) if box["text"]]
+        if not boxes:
+            return (image,)
+
+        img_height, img_width = image.shape[1], image.shape[2]
+
+        # Only the union of all boxes is converted and redrawn
+        left = max(0, min(box["x"] for box in boxes))
+        top = max(0, min(box["y"] for box in boxes))
+        right = min(img_width, max(box["x"] + box["width"] for box in boxes))
+        bottom = min(img_height, max(box["y"] + box["height"] for box in boxes))
+        if left >= right or top >= bottom:
+            return (image,)
+
+        image_tensor_out = image.clone()
+        for index in range(image.shape[0]):
+            region_np = image[index, top:bottom, left:right].cpu().numpy()
+            region_pil = Image.fromarray((region_np * 255).astype(np.uint8))
+            draw = ImageDraw.Draw(region_pil)
+
+            for box in boxes:
+                self.draw_text_box(
+                    draw, box["text"], box["width"], box["height"], box["max_font_size"], box["min_font_size"],
+                    box["font"], box["alignment"], box["color"], box["x"] - left, box["y"] - top,
+                    box["padding"], box["line_height_factor"], box["line_breaking"],
+                )
+
+            image_tensor_out[index, top:bottom, left:right] = torch.from_numpy(
+                np.array(region_pil).astype(np.float32) / 255.0
+            ).to(image_tensor_out.device)
         return (image_tensor_out,)
 
 class BookToolsCalculateTextGrowth:
@@ -412,19 +583,28 @@ class BookToolsCalculateTextGrowth:
                 "font": ("STRING", {"default": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"}),
                 "padding": ("INT", {"default": 50}),
                 "line_height_factor": ("FLOAT", {"default": 1.2, "min": 0.5, "max": 3.0, "step": 0.1}),
+            },
+            "optional": {
+                "texts": ("DICTIONARY",),
+                "mask_sizes": ("STRING", {"multiline": True, "default": ""}),
             }
         }
 
-    RETURN_TYPES = ("INT",)
-    RETURN_NAMES = ("growth_percentage",)
+    RETURN_TYPES = ("INT", "INT",)
+    RETURN_NAMES = ("growth_percentage", "growth_percentages",)
+    OUTPUT_IS_LIST = (False, True,)
     FUNCTION = "calculate"
     CATEGORY = "image/text"
 
-    def calculate_text_bounds(self, text, font_size, font_path, max_width, line_height_factor):
-        font = ImageFont.truetype(font_path, font_size)
+    def calculate_text_bounds(self, text, font_size, font_path, max_width, line_height_factor, word_widths=None):
+        font = load_truetype(font_path, font_size)
         paragraphs = text.split('\n')
         max_line_width = 0
         total_lines = 0
+        # Word widths only depend on the font, so batched calls share them across texts
+        if word_widths is None:
+            word_widths = {}
+        space_width = shaped_runs.text_bbox(font, ' ')[2]
         
         for paragraph in paragraphs:
             words = paragraph.split()
@@ -432,13 +612,15 @@ class BookToolsCalculateTextGrowth:
             current_width = 0
 
             for word in words:
-                word_bbox = font.getbbox(word)
-                word_width = word_bbox[2] - word_bbox[0]
-                space_width = font.getbbox(' ')[2] if current_line else 0
+                word_width = word_widths.get(word)
+                if word_width is None:
+                    word_bbox = shaped_runs.text_bbox(font, word)
+                    word_width = word_widths[word] = word_bbox[2] - word_bbox[0]
+                gap_width = space_width if current_line else 0
                 
-                if current_width + word_width + space_width <= max_width:
+                if current_width + word_width + gap_width <= max_width:
                     current_line.append(word)
-                    current_width += word_width + space_width
+                    current_width += word_width + gap_width
                 else:
                     max_line_width = max(max_line_width, current_width)
                     current_line = [word]
@@ -454,17 +636,7 @@ class BookToolsCalculateTextGrowth:
         
         return max_line_width, total_height
 
-    def calculate(self, text, mask_width, mask_height, min_font_size, font, padding, line_height_factor):
-        textbox_width = mask_width + (2 * padding)
-        textbox_height = mask_height + (2 * padding)
-        
-        effective_width = textbox_width - 2 * padding
-        effective_height = textbox_height - 2 * padding
-
-        text_width, text_height = self.calculate_text_bounds(
-            text, min_font_size, font, effective_width, line_height_factor
-        )
-
+    def growth_percentage(self, text_width, text_height, mask_width, mask_height):
         # Calculate ratios, considering growth in both directions (divide by 2)
         width_ratio = (text_width / mask_width) / 2
         height_ratio = (text_height / mask_height) / 2
@@ -474,12 +646,73 @@ class BookToolsCalculateTextGrowth:
         
         # If ratio is less than 0.5 (1/2), no growth needed
         if growth_ratio <= 0.5:
-            return (0,)
+            return 0
             
         # Convert to percentage (ratio of 1 = 100% growth needed)
-        growth_percentage = min(100, int((growth_ratio - 0.5) * 200))
-        
-        return (growth_percentage,)
+        return min(100, int((growth_ratio - 0.5) * 200))
+
+    def parse_mask_sizes(self, mask_sizes):
+        """
+        Parses mask sizes given as "WIDTHxHEIGHT" entries separated by commas or new lines.
+
+        Returns:
+        - list: (width, height) tuples, empty if no sizes were given.
+        """
+        sizes = []
+        for entry in mask_sizes.replace('\n', ',').split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                width, height = (int(value) for value in entry.lower().split('x'))
+            except ValueError:
+                raise ValueError(f"Invalid mask size '{entry}', expected WIDTHxHEIGHT.")
+            if width < 1 or height < 1:
+                raise ValueError(f"Invalid mask size '{entry}', width and height must be at least 1.")
+            sizes.append((width, height))
+        return sizes
+
+    def calculate(self, text, mask_width, mask_height, min_font_size, font, padding, line_height_factor,
+                  texts=None, mask_sizes=""):
+        """
+        Calculates the mask growth for one text, or for a whole batch of texts and mask sizes.
+
+        Parameters:
+        - texts (dict): Optional PromptSchedule dictionary, replaces text with its values in index order.
+        - mask_sizes (str): Optional "WIDTHxHEIGHT" list, replaces mask_width and mask_height.
+          A single text or a single size is applied to every entry of the other list.
+
+        Returns:
+        - tuple: Growth percentage of the first entry and the list of all growth percentages.
+        """
+        if texts is not None:
+            if not isinstance(texts, dict):
+                raise ValueError("texts must be a dictionary.")
+            text_list = [str(texts[key]) for key in sorted(texts, key=lambda key: int(key) if str(key).isdigit() else 0)]
+        else:
+            text_list = [text]
+        size_list = self.parse_mask_sizes(mask_sizes) or [(mask_width, mask_height)]
+
+        if len(text_list) == 1:
+            text_list = text_list * len(size_list)
+        elif len(size_list) == 1:
+            size_list = size_list * len(text_list)
+        elif len(text_list) != len(size_list):
+            raise ValueError(f"Got {len(text_list)} texts but {len(size_list)} mask sizes.")
+
+        word_widths = {}
+        growth_percentages = []
+        for entry_text, (entry_width, entry_height) in zip(text_list, size_list):
+            textbox_width = entry_width + (2 * padding)
+            effective_width = textbox_width - 2 * padding
+
+            text_width, text_height = self.calculate_text_bounds(
+                entry_text, min_font_size, font, effective_width, line_height_factor, word_widths
+            )
+            growth_percentages.append(self.growth_percentage(text_width, text_height, entry_width, entry_height))
+
+        first = growth_percentages[0] if growth_percentages else 0
+        return (first, growth_percentages,)
 
 class BookToolsRandomTextOverlay:
     def __init__(self, device="cpu"):
@@ -500,6 +733,10 @@ class BookToolsRandomTextOverlay:
                 "margin": ("INT", {"default": 20, "min": 0}),
                 "corner_radius": ("INT", {"default": 15, "min": 0}),
                 "line_height_factor": ("FLOAT", {"default": 1.2, "min": 0.5, "max": 3.0, "step": 0.1}),
+            },
+            "optional": {
+                "tiling": (TILING_MODES, {"default": "auto"}),
+                "workers": ("INT", {"default": 0, "min": 0, "max": 64, "step": 1}),
             }
         }
 
@@ -507,29 +744,8 @@ class BookToolsRandomTextOverlay:
     FUNCTION = "add_random_text_overlay"
     CATEGORY = "image/text"
 
-    def add_random_text_overlay(self, image, text, font_size, font, color, padding, margin, corner_radius, line_height_factor):
-        image_tensor = image
-        image_np = image_tensor.cpu().numpy()
-        image_pil = Image.fromarray((image_np.squeeze(0) * 255).astype(np.uint8))
-        
-        # Convert image to RGBA for transparency support
-        image_pil = image_pil.convert('RGBA')
-        color_rgb = tuple(int(color.lstrip("#")[i:i+2], 16) for i in (0, 2, 4))
-        
-        # Create separate overlay for transparent background
-        bg_overlay = Image.new('RGBA', image_pil.size, (0, 0, 0, 0))
-        bg_draw = ImageDraw.Draw(bg_overlay)
-
-        # Create separate overlay for opaque text
-        text_overlay = Image.new('RGBA', image_pil.size, (0, 0, 0, 0))
-        text_draw = ImageDraw.Draw(text_overlay)
-        
-        loaded_font = ImageFont.truetype(font, font_size)
-
-        # Calculate dimensions and wrap text (existing code)
-        max_width = image_pil.width - (margin * 2) - (padding * 2)
-        line_height = int(font_size * line_height_factor)
-        space_width = text_draw.textlength(" ", font=loaded_font)
+    def wrap_text(self, text, loaded_font, max_width, draw):
+        space_width = shaped_runs.text_length(draw, " ", loaded_font)
         
         # Improved text wrapping that allows mid-word breaks if needed
         lines = []
@@ -537,7 +753,7 @@ class BookToolsRandomTextOverlay:
         current_width = 0
         
         for word in text.split():
-            word_width = text_draw.textlength(word, font=loaded_font)
+            word_width = shaped_runs.text_length(draw, word, loaded_font)
             
             # Add word if it fits, or split long words
             if current_width + word_width <= max_width:
@@ -551,7 +767,7 @@ class BookToolsRandomTextOverlay:
                     chars = []
                     char_width = 0
                     for c in word:
-                        cw = text_draw.textlength(c, font=loaded_font)
+                        cw = shaped_runs.text_length(draw, c, loaded_font)
                         if char_width + cw > max_width:
                             lines.append("".join(chars))
                             chars = []
@@ -567,8 +783,23 @@ class BookToolsRandomTextOverlay:
         if current_line:
             lines.append(" ".join(current_line))
 
+        return lines
+
+    def layout_text(self, img_width, img_height, draw, text, loaded_font, font_size, padding, margin, line_height_factor):
+        """
+        Wraps the text and picks a random position and alignment for it.
+
+        Returns:
+        - tuple: ((bg_x, bg_y, bg_width, bg_height), opacity, placed_lines) where placed_lines
+          holds (x, y, line) for every line.
+        """
+        # Calculate dimensions and wrap text
+        max_width = img_width - (margin * 2) - (padding * 2)
+        line_height = int(font_size * line_height_factor)
+        lines = self.wrap_text(text, loaded_font, max_width, draw)
+
         # Calculate total text block dimensions
-        max_line_width = max(text_draw.textlength(line, font=loaded_font) for line in lines)
+        max_line_width = max(shaped_runs.text_length(draw, line, loaded_font) for line in lines)
         total_height = len(lines) * line_height
 
         # Calculate background dimensions with padding only
@@ -584,13 +815,53 @@ class BookToolsRandomTextOverlay:
             bg_y = margin
             opacity = 0.9
         else:
-            bg_y = image_pil.height - bg_height - margin
+            bg_y = img_height - bg_height - margin
             opacity = 0.8
 
         if alignment == "left":
             bg_x = margin
         else:  # center
-            bg_x = (image_pil.width - bg_width) // 2
+            bg_x = (img_width - bg_width) // 2
+
+        placed_lines = []
+        y = bg_y + padding
+        for line in lines:
+            line_width = shaped_runs.text_length(draw, line, loaded_font)
+            
+            if alignment == "left":
+                x = bg_x + padding
+            else:  # center
+                x = bg_x + (bg_width - line_width) // 2
+
+            placed_lines.append((x, y, line))
+            y += line_height
+
+        return (bg_x, bg_y, bg_width, bg_height), opacity, placed_lines
+
+    def text_bbox(self, bg_box, placed_lines, loaded_font):
+        """Returns the (left, top, right, bottom) area touched by the background box and the text"""
+        bg_x, bg_y, bg_width, bg_height = bg_box
+        boxes = [(bg_x, bg_y, bg_x + bg_width + 1, bg_y + bg_height + 1)]
+        for x, y, line in placed_lines:
+            left, top, right, bottom = shaped_runs.text_bbox(loaded_font, line)
+            # One extra pixel for the shadow
+            boxes.append((x + left, y + top, x + right + 1, y + bottom + 1))
+        return union_bbox(boxes)
+
+    def render_layers(self, size, bg_box, opacity, corner_radius, placed_lines, loaded_font, color_rgb, offset=(0, 0)):
+        """Draws the background and the text into separate transparent layers, shifted by -offset"""
+        off_x, off_y = offset
+        bg_x, bg_y, bg_width, bg_height = bg_box
+        bg_x -= off_x
+        bg_y -= off_y
+
+        # Create separate overlay for transparent background
+        bg_overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+        bg_draw = ImageDraw.Draw(bg_overlay)
+
+        # Create separate overlay for opaque text
+        text_overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+        text_draw = ImageDraw.Draw(text_overlay)
 
         # Draw semi-transparent background
         alpha = int(255 * opacity)
@@ -602,20 +873,60 @@ class BookToolsRandomTextOverlay:
         )
 
         # Draw fully opaque text
-        y = bg_y + padding
-        for line in lines:
-            line_width = text_draw.textlength(line, font=loaded_font)
-            
-            if alignment == "left":
-                x = bg_x + padding
-            else:  # center
-                x = bg_x + (bg_width - line_width) // 2
-
+        for x, y, line in placed_lines:
+            x -= off_x
+            y -= off_y
             # Draw shadow first
-            text_draw.text((x+1, y+1), line, fill=(255,255,255,150), font=loaded_font)  # Shadow
+            shaped_runs.draw_text(text_draw, (x+1, y+1), line, fill=(255,255,255,150), font=loaded_font)  # Shadow
             # Draw main text
-            text_draw.text((x, y), line, fill=(*color_rgb, 255), font=loaded_font)
-            y += line_height
+            shaped_runs.draw_text(text_draw, (x, y), line, fill=(*color_rgb, 255), font=loaded_font)
+
+        return bg_overlay, text_overlay
+
+    def add_random_text_overlay(self, image, text, font_size, font, color, padding, margin, corner_radius, line_height_factor,
+                                tiling="auto", workers=0):
+        if workers > 0:
+            params = {k: v for k, v in locals().items() if k not in ("self", "image", "workers")}
+            return (render_batch(type(self), image, params, workers),)
+
+        color_rgb = tuple(int(color.lstrip("#")[i:i+2], 16) for i in (0, 2, 4))
+        loaded_font = load_truetype(font, font_size)
+
+        img_height, img_width = image.shape[1], image.shape[2]
+        if use_tiling(tiling, image):
+            # Only the tiles under the text box are converted, the rest of the frame is passed through as is
+            draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+            bg_box, opacity, placed_lines = self.layout_text(
+                img_width, img_height, draw, text, loaded_font, font_size, padding, margin, line_height_factor
+            )
+            region = tile_region(self.text_bbox(bg_box, placed_lines, loaded_font), img_width, img_height)
+            if region is None:
+                return (image,)
+
+            left, top, right, bottom = region
+            bg_overlay, text_overlay = self.render_layers(
+                (right - left, bottom - top), bg_box, opacity, corner_radius, placed_lines, loaded_font, color_rgb, region[:2]
+            )
+            region_pils = []
+            for index in range(image.shape[0]):
+                region_pil = Image.alpha_composite(crop_to_pil(image, region, index), bg_overlay)
+                region_pils.append(Image.alpha_composite(region_pil, text_overlay))
+            return (paste_region(image, region_pils, region),)
+
+        image_tensor = image
+        image_np = image_tensor.cpu().numpy()
+        image_pil = Image.fromarray((image_np.squeeze(0) * 255).astype(np.uint8))
+        
+        # Convert image to RGBA for transparency support
+        image_pil = image_pil.convert('RGBA')
+        draw = ImageDraw.Draw(image_pil)
+
+        bg_box, opacity, placed_lines = self.layout_text(
+            image_pil.width, image_pil.height, draw, text, loaded_font, font_size, padding, margin, line_height_factor
+        )
+        bg_overlay, text_overlay = self.render_layers(
+            image_pil.size, bg_box, opacity, corner_radius, placed_lines, loaded_font, color_rgb
+        )
 
         # Composite in the right order: background first, then text
         result = Image.alpha_composite(image_pil, bg_overlay)
@@ -628,6 +939,55 @@ class BookToolsRandomTextOverlay:
         image_tensor_out = torch.unsqueeze(image_tensor_out, 0)
         return (image_tensor_out,)
 
+class BookToolsAsyncTextOverlay(TextOverlay):
+    """
+    Text Overlay that returns immediately and renders in the background.
+    Connect the output to Resolve Image where the captioned image is needed. In loops,
+    send it through Loop End and resolve it in the next iteration, so captioning of
+    iteration N overlaps with generation of iteration N+1.
+    """
+    @classmethod
+    def INPUT_TYPES(cls):
+        # Also accepts the pending output of another async node, it is resolved in the background
+        input_types = super().INPUT_TYPES()
+        input_types["required"]["image"] = (any,)
+        return input_types
+
+    RETURN_TYPES = ("IMAGE_FUTURE",)
+    RETURN_NAMES = ("pending_image",)
+    FUNCTION = "overlay_text_async"
+
+    def overlay_text_async(self, image, **kwargs):
+        return (overlay_executor.submit(self.overlay_text, image, **kwargs),)
+
+class BookToolsAsyncRandomTextOverlay(BookToolsRandomTextOverlay):
+    """Random Text Overlay that returns immediately and renders in the background, see Async Text Overlay."""
+    @classmethod
+    def INPUT_TYPES(cls):
+        input_types = super().INPUT_TYPES()
+        input_types["required"]["image"] = (any,)
+        return input_types
+
+    RETURN_TYPES = ("IMAGE_FUTURE",)
+    RETURN_NAMES = ("pending_image",)
+    FUNCTION = "add_random_text_overlay_async"
+
+    def add_random_text_overlay_async(self, image, **kwargs):
+        return (overlay_executor.submit(self.add_random_text_overlay, image, **kwargs),)
+
+class BookToolsResolveImage:
+    """Waits for a background overlay to finish and outputs the image. Plain images are passed through."""
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {"pending_image": (any,)}}
+
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "main"
+    CATEGORY = "image/text"
+
+    def main(self, pending_image):
+        return (resolve(pending_image),)
+
 NODE_CLASS_MAPPINGS = {
     "BTPromptSelector": BookToolsPromptSelector,
     "BTPromptSchedule": BookToolsPromptSchedule,
@@ -635,10 +995,15 @@ NODE_CLASS_MAPPINGS = {
     "LoopStart": BookToolsLoopStart,
     "LoopEnd": BookToolsLoopEnd,
     "EndQueue": BookToolsEndQueue,
+    "CacheControl": BookToolsCacheControl,
     "ImageTextOverlay": BookToolsImageTextOverlay,
+    "MultiBoxTextOverlay": BookToolsMultiBoxTextOverlay,
     "DownloadFont": BookToolsDownloadFont,
     "TextGrowth": BookToolsCalculateTextGrowth,
     "RandomTextOverlay": BookToolsRandomTextOverlay,
+    "AsyncTextOverlay": BookToolsAsyncTextOverlay,
+    "AsyncRandomTextOverlay": BookToolsAsyncRandomTextOverlay,
+    "ResolveImage": BookToolsResolveImage,
     "ComfyUI_textover": TextOverlay,
     "TestNode": TestNode,
 }
@@ -650,10 +1015,15 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "LoopStart": "[Book Tools] Loop Start",
     "LoopEnd": "[Book Tools] Loop End",
     "EndQueue": "[Book Tools] End Queue",
+    "CacheControl": "[Book Tools] Cache Control",
     "ImageTextOverlay": "[Book Tools] Image Text Overlay",
+    "MultiBoxTextOverlay": "[Book Tools] Multi-Box Text Overlay",
     "DownloadFont": "[Book Tools] Download Font",
     "TextGrowth": "[Book Tools] Calculate Text Growth",
     "RandomTextOverlay": "[Book Tools] Random Text Overlay",
+    "AsyncTextOverlay": "[Book Tools] Text Overlay (Async)",
+    "AsyncRandomTextOverlay": "[Book Tools] Random Text Overlay (Async)",
+    "ResolveImage": "[Book Tools] Resolve Image",
     "ComfyUI_textover": "Text Overlay",
     "TestNode": "Test Node",
 }
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PendingImage:
+    """Handle to an overlay that is still rendering in the background"""
+
+    def __init__(self, future):
+        self.future = future
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """Blocks until the image is rendered and returns it, re-raising any rendering error"""
+        return self.future.result(timeout)
+
+
+def resolve(value, timeout=None):
+    """Returns the rendered image for a PendingImage, any other value is returned unchanged"""
+    if isinstance(value, PendingImage):
+        return value.result(timeout)
+    return value
+
+
+class OverlayExecutor:
+    """
+    Runs overlay rendering off the executor thread.
+
+    PIL releases the GIL for most of its pixel work and torch does for GPU work, so a
+    caption rendering here overlaps with sampling on the main thread. Inputs that are
+    themselves PendingImage are resolved inside the worker, so async nodes can be
+    chained without blocking the graph. Renders start in submission order, so a
+    chained render only waits for ones already running. The default of one worker
+    keeps background captioning to at most one core next to the executor thread.
+    """
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max_workers
+        self.executor = None
+
+    def submit(self, render, image, **params):
+        if self.executor is None:
+            # Created lazily, so the thread only exists once an async node runs
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="book_tools_overlay")
+        return PendingImage(self.executor.submit(lambda: render(resolve(image), **params)[0]))
+
+    def shutdown(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+
+overlay_executor = OverlayExecutor(int(os.environ.get("BOOK_TOOLS_ASYNC_WORKERS", "1")))
@@ -0,0 +1,205 @@
+"""
+Headless bulk captioning with the overlay nodes, no ComfyUI server required.
+
+Reads a JSONL manifest with one image per line:
+
+    {"image": "in/001.png", "output": "out/001.png", "node": "ComfyUI_textover", "params": {"heading": "Page 1"}}
+
+"output" defaults to the input file name inside --output-dir, entries that would write the
+same output as an earlier line are reported as failures. "node" defaults to --node and
+"params" only needs the inputs that differ from the node defaults. Example:
+
+    python bulk_caption.py manifest.jsonl --output-dir out --workers 8
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from PIL import Image
+
+SUPPORTED_NODES = ["ComfyUI_textover", "ImageTextOverlay", "RandomTextOverlay", "MultiBoxTextOverlay"]
+
+_package = None
+_nodes = {}
+
+
+def load_package():
+    """Imports the node package outside ComfyUI, with a stub for the ComfyUI 'nodes' module"""
+    global _package
+    if _package is not None:
+        return _package
+
+    if "nodes" not in sys.modules:
+        stub = types.ModuleType("nodes")
+        stub.interrupt_processing = lambda *args, **kwargs: None
+        sys.modules["nodes"] = stub
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location(
+        "book_tools", os.path.join(package_dir, "__init__.py"), submodule_search_locations=[package_dir]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["book_tools"] = package
+    spec.loader.exec_module(package)
+    _package = package
+    return package
+
+
+def default_params(node_class):
+    """Collects the widget defaults of a node, so manifests only need to list what they change"""
+    input_types = node_class.INPUT_TYPES()
+    params = {}
+    for section in ("required", "optional"):
+        for name, spec in input_types.get(section, {}).items():
+            if name == "image":
+                continue
+            options = spec[1] if len(spec) > 1 else {}
+            if "default" in options:
+                params[name] = options["default"]
+            elif isinstance(spec[0], list):
+                params[name] = spec[0][0]
+    return params
+
+
+def get_node(node_name):
+    if node_name not in _nodes:
+        if node_name not in SUPPORTED_NODES:
+            raise ValueError(f"Unsupported node {node_name}, expected one of: {', '.join(SUPPORTED_NODES)}")
+        package = load_package()
+        node_class = package.NODE_CLASS_MAPPINGS[node_name]
+        _nodes[node_name] = (node_class(), default_params(node_class))
+    return _nodes[node_name]
+
+
+def init_worker():
+    import torch
+    # One process per core already, keep torch from spawning its own threads on top
+    torch.set_num_threads(1)
+    load_package()
+
+
+def caption_image(entry, default_node):
+    """Renders one manifest entry and writes the result, returns the output path"""
+    import torch
+
+    node, params = get_node(entry.get("node", default_node))
+    node_params = {**params, **entry.get("params", {})}
+    if "workers" in node_params:
+        # This is already a pool worker, a nested pool would keep it from ever exiting
+        node_params["workers"] = 0
+
+    with Image.open(entry["image"]) as image_pil:
+        image_np = np.asarray(image_pil.convert("RGB"), dtype=np.float32) / 255.0
+    image = torch.from_numpy(image_np).unsqueeze(0)
+
+    result = getattr(node, node.FUNCTION)(image, **node_params)[0]
+
+    output = entry["output"]
+    output_dir = os.path.dirname(output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    result_np = (result[0].cpu().numpy() * 255).clip(0, 255).astype(np.uint8)
+    Image.fromarray(result_np).save(output)
+    return output
+
+
+def read_manifest(path, output_dir):
+    """
+    Yields (line_number, entry) pairs lazily, so large manifests are never fully loaded.
+
+    An entry whose output path was already used by an earlier line is yielded as an
+    error instead, so two inputs with the same file name never overwrite each other.
+    """
+    outputs = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(entry, dict) or "image" not in entry:
+                yield line_number, ValueError("Entry must be an object with an 'image' key")
+                continue
+            if "output" not in entry:
+                entry["output"] = os.path.join(output_dir, os.path.basename(entry["image"]))
+            output = os.path.normcase(os.path.abspath(entry["output"]))
+            if output in outputs:
+                yield line_number, ValueError(
+                    f"Output {entry['output']} is already written by line {outputs[output]}, set a distinct 'output'"
+                )
+                continue
+            outputs[output] = line_number
+            yield line_number, entry
+
+
+def run(manifest, output_dir, default_node, workers, max_in_flight):
+    """
+    Captions every manifest entry with a process pool.
+
+    At most max_in_flight entries are submitted at a time, which bounds the number of
+    decoded images held in memory regardless of the manifest size.
+
+    Returns:
+    - tuple: (succeeded, failed) counts.
+    """
+    succeeded = 0
+    failed = 0
+    start_time = time.perf_counter()
+
+    def collect(done):
+        nonlocal succeeded, failed
+        for future in done:
+            line_number = in_flight.pop(future)
+            try:
+                future.result()
+                succeeded += 1
+            except Exception as e:
+                failed += 1
+                print(f"Line {line_number}: {e}", file=sys.stderr)
+
+    in_flight = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        for line_number, entry in read_manifest(manifest, output_dir):
+            if isinstance(entry, Exception):
+                failed += 1
+                print(f"Line {line_number}: {entry}", file=sys.stderr)
+                continue
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight[executor.submit(caption_image, entry, default_node)] = line_number
+        collect(wait(in_flight).done)
+
+    elapsed = time.perf_counter() - start_time
+    total = succeeded + failed
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {total} images in {elapsed:.1f}s ({rate:.1f} images/s), {succeeded} succeeded, {failed} failed")
+    return succeeded, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caption images from a JSONL manifest with the Book Tools overlay nodes.")
+    parser.add_argument("manifest", help="JSONL file with one {\"image\", \"output\", \"node\", \"params\"} object per line")
+    parser.add_argument("--output-dir", default="output", help="Directory for entries without an explicit output path")
+    parser.add_argument("--node", default="ComfyUI_textover", choices=SUPPORTED_NODES, help="Node used when an entry does not name one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="Maximum queued images, defaults to twice the worker count")
+    args = parser.parse_args(argv)
+
+    max_in_flight = args.max_in_flight or args.workers * 2
+    _, failed = run(args.manifest, args.output_dir, args.node, args.workers, max_in_flight)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
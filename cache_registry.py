@@ -0,0 +1,202 @@
+import os
+import sys
+from collections import OrderedDict
+from threading import RLock
+
+import torch
+from PIL import Image
+
+# Bookkeeping per entry on top of key and value: the OrderedDict slot and the (value, size, tick) record
+ENTRY_OVERHEAD = 200
+
+
+def estimate_size(value):
+    """Rough size in bytes of a cached key or value, used to charge it against the budget"""
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class BoundedCache:
+    """
+    LRU cache whose entries are charged against the shared CacheRegistry budget.
+
+    Create instances through CacheRegistry.create. max_bytes optionally caps this cache
+    on its own, on top of the registry-wide budget.
+    """
+
+    def __init__(self, registry, name, sizeof=estimate_size, max_bytes=None):
+        self.registry = registry
+        self.name = name
+        self.sizeof = sizeof
+        self.max_bytes = max_bytes
+        # key -> (value, size, tick of last use)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self.registry.lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.registry.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries[key] = (entry[0], entry[1], self.registry.next_tick())
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        # Keys hold whole text lines or every word width of a paragraph, so they are charged too
+        size = estimate_size(key) + self.sizeof(value) + ENTRY_OVERHEAD
+        with self.registry.lock:
+            self._remove(key)
+            if size > self.registry.max_bytes or (self.max_bytes is not None and size > self.max_bytes):
+                return
+            self.entries[key] = (value, size, self.registry.next_tick())
+            self.bytes += size
+            self.registry.total_bytes += size
+            while self.max_bytes is not None and self.bytes > self.max_bytes:
+                self.pop_oldest()
+            self.registry.enforce_budget()
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def oldest_tick(self):
+        if not self.entries:
+            return None
+        return self.entries[next(iter(self.entries))][2]
+
+    def pop_oldest(self):
+        key = next(iter(self.entries))
+        self._remove(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+            self.registry.total_bytes -= entry[1]
+
+    def clear(self):
+        with self.registry.lock:
+            self.registry.total_bytes -= self.bytes
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.registry.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CacheRegistry:
+    """
+    Shared memory budget for every cache in the package.
+
+    When the total size of all registered caches exceeds max_bytes, the least recently
+    used entry across all caches is evicted first, so large renders and many small
+    measurements compete for the same budget.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.caches = {}
+        self.total_bytes = 0
+        self.tick = 0
+        self.lock = RLock()
+        self.reset_hooks = []
+
+    def reset_after_fork(self):
+        # A forked child only has the forking thread, a lock held by any other thread would never be released
+        self.lock = RLock()
+
+    def next_tick(self):
+        self.tick += 1
+        return self.tick
+
+    def create(self, name, sizeof=estimate_size, max_bytes=None):
+        """Registers a new cache, or returns the existing one with that name"""
+        with self.lock:
+            if name not in self.caches:
+                self.caches[name] = BoundedCache(self, name, sizeof, max_bytes)
+            return self.caches[name]
+
+    def add_reset_hook(self, hook):
+        """Registers a function called after clear() and after the budget changes, for copies of the caches kept elsewhere"""
+        self.reset_hooks.append(hook)
+
+    def set_budget(self, max_bytes):
+        with self.lock:
+            if max_bytes == self.max_bytes:
+                return
+            self.max_bytes = max_bytes
+            self.enforce_budget()
+        for hook in self.reset_hooks:
+            hook()
+
+    def enforce_budget(self):
+        with self.lock:
+            while self.total_bytes > self.max_bytes:
+                oldest = None
+                for cache in self.caches.values():
+                    tick = cache.oldest_tick()
+                    if tick is not None and (oldest is None or tick < oldest[0]):
+                        oldest = (tick, cache)
+                if oldest is None:
+                    break
+                oldest[1].pop_oldest()
+
+    def clear(self, names=None):
+        """Empties the named caches, or all of them"""
+        with self.lock:
+            for name, cache in self.caches.items():
+                if names is None or name in names:
+                    cache.clear()
+        for hook in self.reset_hooks:
+            hook()
+
+    def stats(self):
+        """
+        Returns a snapshot of every cache.
+
+        Returns:
+        - dict: Per-cache entries, bytes, hits, misses and hit_ratio under "caches",
+          plus the overall "total_bytes" and "max_bytes".
+        """
+        with self.lock:
+            return {
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "caches": {name: cache.stats() for name, cache in self.caches.items()},
+            }
+
+
+cache_registry = CacheRegistry(int(float(os.environ.get("BOOK_TOOLS_CACHE_MB", "1024")) * 1024 * 1024))
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=cache_registry.reset_after_fork)
@@ -0,0 +1,18 @@
+import os
+
+from PIL import ImageFont
+
+from .cache_registry import cache_registry
+
+
+def _font_size(font):
+    # FreeType keeps the whole font file in memory
+    return os.path.getsize(font.path) if isinstance(font.path, str) else 1024 * 1024
+
+
+_fonts = cache_registry.create("fonts", sizeof=_font_size)
+
+
+def load_truetype(font_path, size):
+    """Loads a font once per path and size, font objects are only read from so they can be shared"""
+    return _fonts.get_or_compute((font_path, size), lambda: ImageFont.truetype(font_path, size))
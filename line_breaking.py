@@ -0,0 +1,77 @@
+from .cache_registry import cache_registry
+
+LINE_BREAKING_MODES = ["greedy", "optimal"]
+
+_line_breaks = cache_registry.create("line_breaks")
+
+
+def optimal_breaks(word_widths, space_width, max_width):
+    """
+    Knuth-Plass style line breaking over a single paragraph.
+
+    Picks the breaks that use the fewest lines (never more than greedy wrapping)
+    and, among those, minimise the sum of squared trailing space on every line but
+    the last. Each line only looks back over the words that can still fit in
+    max_width, so the cost is O(n*k) for n words and at most k words per line.
+
+    Parameters:
+    - word_widths (tuple): Width of every word in the paragraph.
+    - space_width (float): Width of the gap between two words.
+    - max_width (float): Available line width.
+
+    Returns:
+    - tuple: (start, end) word index ranges, one per line.
+    """
+    return _line_breaks.get_or_compute(
+        (word_widths, space_width, max_width), lambda: _optimal_breaks(word_widths, space_width, max_width)
+    )
+
+
+def _optimal_breaks(word_widths, space_width, max_width):
+    n = len(word_widths)
+    if n == 0:
+        return ()
+
+    prefix = [0.0] * (n + 1)
+    for i, width in enumerate(word_widths):
+        prefix[i + 1] = prefix[i] + width
+
+    best_lines = [0] + [n + 1] * n
+    best_cost = [0.0] + [float("inf")] * n
+    previous = [0] * (n + 1)
+
+    for end in range(1, n + 1):
+        end_width = prefix[end] - space_width
+        last_line = end == n
+        start = end - 1
+        while start >= 0:
+            line_width = end_width - prefix[start] + space_width * (end - start)
+            # A single word wider than the line still gets a line of its own
+            if line_width > max_width and start < end - 1:
+                break
+            lines = best_lines[start] + 1
+            if lines <= best_lines[end]:
+                slack = max_width - line_width
+                cost = best_cost[start]
+                if not last_line and slack > 0:
+                    cost += slack * slack
+                if lines < best_lines[end] or cost < best_cost[end]:
+                    best_lines[end] = lines
+                    best_cost[end] = cost
+                    previous[end] = start
+            start -= 1
+
+    breaks = []
+    end = n
+    while end > 0:
+        start = previous[end]
+        breaks.append((start, end))
+        end = start
+    breaks.reverse()
+    return tuple(breaks)
+
+
+def wrap_words(words, word_widths, space_width, max_width):
+    """Joins words into lines using the optimal breaks for their widths."""
+    breaks = optimal_breaks(tuple(word_widths), space_width, max_width)
+    return [" ".join(words[start:end]) for start, end in breaks]
@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import random
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from threading import Lock
+
+import numpy as np
+import torch
+
+from .cache_registry import cache_registry
+
+_executor = None
+_executor_workers = 0
+_executor_lock = Lock()
+_nodes = {}
+
+
+def _init_worker(cache_bytes):
+    # Every worker is its own core, and forked workers must not enter the parent's OpenMP pool
+    torch.set_num_threads(1)
+    # Forked workers inherit the parent's random state, reseed so frames don't all get the same layout
+    random.seed()
+    # Every worker keeps its own copy of the caches, together they stay within the configured budget
+    cache_registry.set_budget(cache_bytes)
+
+
+def _reset_after_fork():
+    global _executor, _executor_workers, _executor_lock
+    # A forked child only has the forking thread, the parent's pool and a lock another thread held are useless there
+    _executor = None
+    _executor_workers = 0
+    _executor_lock = Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor(workers):
+    """Returns the pool for this worker count, callers hold _executor_lock until they have submitted"""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown()
+        # Forked workers already have the node modules loaded, ComfyUI's module names can't be re-imported.
+        # Locks held by other threads at fork time are reset in the child, see register_at_fork
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(cache_registry.max_bytes // workers,),
+        )
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown():
+    """Stops the worker processes, the next batch starts a new pool"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _executor_workers = 0
+
+
+# Workers hold their own copies of the caches, clearing them or changing the budget starts a fresh pool
+cache_registry.add_reset_hook(shutdown)
+
+
+def _render_into(node_class, params, input_buf, output_buf, shape, index):
+    # Node instances live as long as the worker, together with the fonts they loaded
+    if node_class not in _nodes:
+        _nodes[node_class] = node_class()
+    node = _nodes[node_class]
+
+    frames = np.ndarray(shape, dtype=np.float32, buffer=input_buf)
+    outputs = np.ndarray(shape, dtype=np.float32, buffer=output_buf)
+    result = getattr(node, node_class.FUNCTION)(torch.from_numpy(frames[index:index + 1]), **params)[0]
+    if tuple(result.shape[1:]) != tuple(shape[1:]):
+        raise ValueError(f"Frame {index} changed size from {tuple(shape[1:])} to {tuple(result.shape[1:])}")
+    outputs[index] = result[0].cpu().numpy()
+
+
+def _render_frame(node_class, params, input_name, output_name, shape, index):
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    error = None
+    try:
+        _render_into(node_class, params, input_shm.buf, output_shm.buf, shape, index)
+    except Exception:
+        # Keep only the text, the traceback would hold on to views of the shared buffers
+        error = traceback.format_exc()
+    input_shm.close()
+    output_shm.close()
+    if error is not None:
+        raise RuntimeError(error)
+
+
+def render_batch(node_class, image, params, workers):
+    """
+    Renders every frame of the batch with a pool of worker processes.
+
+    Frames are handed over through shared memory instead of being pickled, each worker
+    runs the node on one frame in-process and writes its result back in place, so the
+    output keeps the input frame order.
+
+    Parameters:
+    - node_class (type): Node to run, its FUNCTION is called with one frame at a time.
+    - image (torch.Tensor): (B, H, W, C) batch, every frame must keep its size.
+    - params (dict): Remaining node parameters, identical for every frame.
+    - workers (int): Number of worker processes.
+
+    Returns:
+    - torch.Tensor: Rendered batch on the input device.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("WARNING: Process pool rendering needs the 'fork' start method, rendering in-process")
+        node = node_class()
+        frames = [getattr(node, node_class.FUNCTION)(image[i:i + 1], **params)[0] for i in range(image.shape[0])]
+        return torch.cat(frames, dim=0)
+
+    frames_np = np.ascontiguousarray(image.detach().cpu().numpy(), dtype=np.float32)
+    shape = frames_np.shape
+    input_shm = shared_memory.SharedMemory(create=True, size=frames_np.nbytes)
+    output_shm = shared_memory.SharedMemory(create=True, size=frames_np.nbytes)
+    try:
+        np.ndarray(shape, dtype=np.float32, buffer=input_shm.buf)[:] = frames_np
+        del frames_np
+
+        try:
+            _render_frames(node_class, params, input_shm.name, output_shm.name, shape, workers)
+        except BrokenProcessPool:
+            # A worker died (out of memory or killed), replace the pool and try once more
+            shutdown()
+            try:
+                _render_frames(node_class, params, input_shm.name, output_shm.name, shape, workers)
+            except BrokenProcessPool as e:
+                shutdown()
+                raise RuntimeError(
+                    f"A render worker process died twice in a row, try fewer workers or a smaller batch: {e}"
+                ) from e
+
+        image_tensor_out = torch.from_numpy(np.ndarray(shape, dtype=np.float32, buffer=output_shm.buf).copy())
+        return image_tensor_out.to(image.device)
+    finally:
+        input_shm.close()
+        input_shm.unlink()
+        output_shm.close()
+        output_shm.unlink()
+
+
+def _render_frames(node_class, params, input_name, output_name, shape, workers):
+    # shutdown() from another thread waits for submitted frames, but must not stop the pool before they are submitted
+    with _executor_lock:
+        executor = _get_executor(workers)
+        futures = [
+            executor.submit(_render_frame, node_class, params, input_name, output_name, shape, index)
+            for index in range(shape[0])
+        ]
+    for future in futures:
+        future.result()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+
+import numpy as np
+import torch
+
+from .cache_registry import cache_registry
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def _hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+class RenderCache:
+    """
+    Content-addressed cache for rendered overlay images.
+
+    Entries are keyed by a hash of the input image plus every node parameter, kept in
+    a byte-bounded in-memory LRU registered with the shared cache budget and, when
+    spill_dir is set, written to disk as compressed .npz files so they survive eviction
+    and restarts.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, spill_dir=None, name="renders"):
+        self.memory = cache_registry.create(name, max_bytes=max_bytes)
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def make_key(self, node_name, image, params):
+        """
+        Builds the cache key for one node call.
+
+        Parameters:
+        - node_name (str): Name of the node, so different nodes never share entries.
+        - image (torch.Tensor): Input image tensor.
+        - params (dict): All remaining node parameters.
+
+        Returns:
+        - str: Hex digest identifying the call.
+        """
+        image_np = np.ascontiguousarray(image.detach().cpu().numpy())
+        hasher = _hasher()
+        hasher.update(repr((node_name, image_np.shape, image_np.dtype.str, sorted(params.items()))).encode())
+        hasher.update(image_np.data)
+        return hasher.hexdigest()
+
+    def get(self, key):
+        tensor = self.memory.get(key)
+        if tensor is not None:
+            return tensor
+
+        tensor = self._load(key)
+        if tensor is not None:
+            self.memory.put(key, tensor)
+        return tensor
+
+    def put(self, key, tensor):
+        tensor = tensor.detach().cpu()
+        self.memory.put(key, tensor)
+        self._spill(key, tensor)
+
+    def cached(self, node_name, image, params, render):
+        """Returns the cached output tuple for this call, rendering and storing it on a miss"""
+        key = self.make_key(node_name, image, params)
+        tensor = self.get(key)
+        if tensor is not None:
+            return (tensor,)
+        result = render()
+        self.put(key, result[0])
+        return result
+
+    def clear(self):
+        """Drops the in-memory entries, files already spilled to disk are kept"""
+        self.memory.clear()
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.npz")
+
+    def _spill(self, key, tensor):
+        if not self.spill_dir:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+
+        array = tensor.numpy()
+        # Overlay outputs usually come straight from 8-bit PIL images, store those as uint8
+        quantized = np.round(array * 255.0).astype(np.uint8)
+        if np.array_equal(quantized.astype(np.float32) / 255.0, array):
+            array = quantized
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez_compressed(f, image=array)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not write render cache entry {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _load(self, key):
+        if not self.spill_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                array = data["image"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNING: Could not read render cache entry {path}: {e}")
+            return None
+        if array.dtype == np.uint8:
+            array = array.astype(np.float32) / 255.0
+        return torch.from_numpy(array)
+
+
+render_cache = RenderCache(
+    max_bytes=int(float(os.environ.get("BOOK_TOOLS_RENDER_CACHE_MB", "256")) * 1024 * 1024),
+    spill_dir=os.environ.get("BOOK_TOOLS_RENDER_CACHE_DIR") or None,
+)
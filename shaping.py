@@ -0,0 +1,70 @@
+import math
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .cache_registry import cache_registry
+
+
+class ShapedRunCache:
+    """
+    Caches shaped text runs so every line is shaped once instead of once per call.
+
+    With the raqm layout engine each textlength, getbbox and draw.text call shapes the
+    string again. Pillow does not expose glyph ids and advances, so a run is cached in
+    the form Pillow can reuse: its measurements plus the rasterized coverage mask, keyed
+    by font, size, layout engine, direction, language and text. Drawing a cached run
+    stamps the mask with the same fill Pillow's own draw.text uses, so shadow and main
+    text reuse one shaping result and the output is pixel-identical.
+    """
+
+    def __init__(self, name="shaped_runs"):
+        self.cache = cache_registry.create(name)
+
+    def _font_key(self, font):
+        if isinstance(font, ImageFont.FreeTypeFont) and isinstance(font.path, str):
+            return (font.path, font.size, font.index, font.encoding, font.layout_engine)
+        # Fonts loaded from memory are keyed by the object itself, which also keeps it alive
+        return font
+
+    def _get(self, key, compute):
+        return self.cache.get_or_compute(key, compute)
+
+    def clear(self):
+        self.cache.clear()
+
+    def text_length(self, draw, text, font, direction=None, language=None):
+        """Cached draw.textlength"""
+        key = ("length", self._font_key(font), draw.fontmode, direction, language, text)
+        return self._get(key, lambda: draw.textlength(text, font=font, direction=direction, language=language))
+
+    def text_bbox(self, font, text, direction=None, language=None):
+        """Cached font.getbbox"""
+        key = ("bbox", self._font_key(font), direction, language, text)
+        return self._get(key, lambda: font.getbbox(text, direction=direction, language=language))
+
+    def _render_run(self, font, text, start, direction, language):
+        left, top, right, bottom = self.text_bbox(font, text, direction, language)
+        # Draw at a non-negative position with the same sub-pixel start Pillow would use
+        pad_x, pad_y = max(0, -left), max(0, -top)
+        mask = Image.new("L", (pad_x + right + 2, pad_y + bottom + 2), 0)
+        ImageDraw.Draw(mask).text(
+            (start[0] + pad_x, start[1] + pad_y), text, fill=255, font=font, direction=direction, language=language
+        )
+        return mask.crop((pad_x + left, pad_y + top, pad_x + right + 2, pad_y + bottom + 2)), left, top
+
+    def draw_text(self, draw, xy, text, fill, font, direction=None, language=None):
+        """Draws text like draw.text, reusing the cached run for repeated lines"""
+        x, y = xy
+        if (x < 0 or y < 0 or draw.fontmode != "L" or not text
+                or not isinstance(font, ImageFont.FreeTypeFont)):
+            # Negative positions use a different sub-pixel start, leave those to Pillow
+            draw.text(xy, text, fill=fill, font=font, direction=direction, language=language)
+            return
+
+        start = (math.modf(x)[0], math.modf(y)[0])
+        key = ("run", self._font_key(font), start, direction, language, text)
+        mask, left, top = self._get(key, lambda: self._render_run(font, text, start, direction, language))
+        draw.bitmap((int(x) + left, int(y) + top), mask, fill=fill)
+
+
+shaped_runs = ShapedRunCache()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bulk_caption import default_params, load_package  # noqa: E402
+
+package = load_package()
+
+ITERATIONS = 4
+
+
+def make_params(node_class, heading):
+    params = default_params(node_class)
+    params["heading"] = heading
+    params["description"] = "Captioned in the background while the next image is generated"
+    return params
+
+
+def test_async_overlay_overlaps_with_slow_upstream():
+    """Runs a loop where a sleep stands in for sampling, once with the synchronous node and once with the async one"""
+    sync_node = package.TextOverlay()
+    async_node = package.BookToolsAsyncTextOverlay()
+    resolve_node = package.BookToolsResolveImage()
+    params = make_params(package.TextOverlay, "Warm up")
+    torch.manual_seed(0)
+    images = [torch.rand(1, 1024, 1024, 3) for _ in range(ITERATIONS)]
+
+    # Warm the font and text caches, then make the upstream stage as slow as one render
+    sync_node.overlay_text(images[0], **params)
+    start_time = time.perf_counter()
+    sync_node.overlay_text(images[0], **params)
+    upstream_seconds = max(0.05, time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    expected = []
+    for index, image in enumerate(images):
+        time.sleep(upstream_seconds)
+        expected.append(sync_node.overlay_text(image, **make_params(package.TextOverlay, f"Page {index}"))[0])
+    serial_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    pending = []
+    for index, image in enumerate(images):
+        time.sleep(upstream_seconds)
+        pending.append(
+            async_node.overlay_text_async(image, **make_params(package.TextOverlay, f"Page {index}"))[0]
+        )
+    results = [resolve_node.main(pending_image)[0] for pending_image in pending]
+    overlapped_seconds = time.perf_counter() - start_time
+
+    for result, reference in zip(results, expected):
+        assert torch.equal(result, reference)
+    assert overlapped_seconds < serial_seconds, f"overlapped {overlapped_seconds:.2f}s, serial {serial_seconds:.2f}s"
+
+
+def test_async_overlays_chain():
+    """A pending image can feed another async overlay directly"""
+    params = make_params(package.TextOverlay, "First")
+    image = torch.rand(1, 256, 256, 3)
+
+    first = package.BookToolsAsyncTextOverlay().overlay_text_async(image, **params)[0]
+    second = package.BookToolsAsyncTextOverlay().overlay_text_async(first, **make_params(package.TextOverlay, "Second"))[0]
+
+    expected = package.TextOverlay().overlay_text(
+        package.TextOverlay().overlay_text(image, **params)[0], **make_params(package.TextOverlay, "Second")
+    )[0]
+    assert torch.equal(package.BookToolsResolveImage().main(second)[0], expected)
@@ -2,6 +2,12 @@ from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import torch
 import numpy as np
 import os
+from .line_breaking import LINE_BREAKING_MODES, wrap_words
+from .render_cache import render_cache
+from .fonts import load_truetype
+from .shaping import shaped_runs
+from .process_pool import render_batch
+from .tiling import TILING_MODES, use_tiling, union_bbox, tile_region, crop_to_pil, paste_region
 
 class TextOverlay:
     def __init__(self, device="cpu"):
@@ -59,6 +65,14 @@ class TextOverlay:
                 "shadow_color": ("STRING", {"default": "#000000"}),
                 "shadow_opacity": ("INT", {"default": 128, "min": 0, "max": 255, "step": 1}),
                 "shadow_blur": ("INT", {"default": 3, "min": 0, "max": 10, "step": 1}),  # New blur setting
+            },
+            "optional": {
+                "line_breaking": (LINE_BREAKING_MODES, {"default": "greedy"}),
+                "use_cache": ("BOOLEAN", {"default": False}),
+                "sprite_mode": ("BOOLEAN", {"default": False}),
+                "tiling": (TILING_MODES, {"default": "auto"}),
+                "workers": ("INT", {"default": 0, "min": 0, "max": 64, "step": 1}),
+                "draft_scale": ("FLOAT", {"default": 1.0, "min": 0.1, "max": 1.0, "step": 0.05}),
             }
         }
 
@@ -66,15 +80,19 @@ class TextOverlay:
     FUNCTION = "overlay_text"
     CATEGORY = "image/text"
 
-    def wrap_text(self, text, font, max_width, draw):
+    def wrap_text(self, text, font, max_width, draw, line_breaking="greedy"):
         words = text.split()
+        if line_breaking == "optimal":
+            word_widths = [shaped_runs.text_length(draw, word, font) for word in words]
+            return wrap_words(words, word_widths, shaped_runs.text_length(draw, " ", font), max_width)
+
         lines = []
         current_line = []
         current_width = 0
 
         for word in words:
-            word_width = draw.textlength(word, font=font)
-            space_width = draw.textlength(" ", font=font) if current_line else 0
+            word_width = shaped_runs.text_length(draw, word, font)
+            space_width = shaped_runs.text_length(draw, " ", font) if current_line else 0
             
             if current_width + word_width + space_width <= max_width:
                 current_line.append(word)
@@ -106,83 +124,71 @@ class TextOverlay:
         
         return total_height
 
-    def overlay_text(
-        self, image, 
+    def load_font(self, font_name, size):
+        font_path = os.path.join(self.fonts_dir, font_name)
+        if not os.path.exists(font_path):
+            print(f"WARNING: Font file not found at {font_path}, falling back to default system font")
+            # Fallback to a system font if the specific font is not found
+            return ImageFont.load_default()
+        return load_truetype(font_path, size)
+
+    def parse_color(self, color_str):
+        return tuple(int(color_str.lstrip("#")[i:i+2], 16) for i in (0, 2, 4))
+
+    def layout_text(
+        self, img_width, img_height, draw,
         heading, heading_font, heading_size, heading_color,
         description, description_font, description_size, description_color,
         author, author_font, author_size, author_color,
         horizontal_align, vertical_position, margin_percent, line_spacing, width_percent,
         heading_padding, description_padding, author_padding, boundary_padding,
-        shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur
+        line_breaking="greedy"
     ):
-        # Convert tensor to PIL Image
-        image_tensor = image
-        image_np = image_tensor.cpu().numpy()
-        image_pil = Image.fromarray((image_np.squeeze(0) * 255).astype(np.uint8))
-        
-        # Create an RGBA version for alpha blending if needed
-        if image_pil.mode != 'RGBA':
-            image_pil = image_pil.convert('RGBA')
-        
-        draw = ImageDraw.Draw(image_pil)
+        """
+        Wraps and positions every text line for an image of the given size.
 
-        # Get image dimensions
-        img_width, img_height = image_pil.size
+        Returns:
+        - list: (x, y, line, font, color) for every line, in drawing order.
+        """
         self.line_spacing = line_spacing
 
         # Calculate margins and max width based on percentages
         margin = int((margin_percent / 100) * img_width)
         max_width = int((width_percent / 100) * img_width)
         
-        # Helper functions
-        def load_font(font_name, size):
-            font_path = os.path.join(self.fonts_dir, font_name)
-            if not os.path.exists(font_path):
-                print(f"WARNING: Font file not found at {font_path}, falling back to default system font")
-                # Fallback to a system font if the specific font is not found
-                return ImageFont.load_default()
-            return ImageFont.truetype(font_path, size)
-
-        def parse_color(color_str):
-            return tuple(int(color_str.lstrip("#")[i:i+2], 16) for i in (0, 2, 4))
-        
-        # Parse shadow color with opacity
-        shadow_rgb = parse_color(shadow_color)
-        shadow_rgba = (shadow_rgb[0], shadow_rgb[1], shadow_rgb[2], shadow_opacity)
-        
         # Prepare all text elements
         text_blocks = []
         text_paddings = []
         
         if heading:
-            heading_font_obj = load_font(heading_font, heading_size)
-            heading_lines = self.wrap_text(heading, heading_font_obj, max_width, draw)
+            heading_font_obj = self.load_font(heading_font, heading_size)
+            heading_lines = self.wrap_text(heading, heading_font_obj, max_width, draw, line_breaking)
             text_blocks.append({
                 'lines': heading_lines,
                 'font': heading_font_obj,
-                'color': parse_color(heading_color),
+                'color': self.parse_color(heading_color),
                 'font_size': heading_size
             })
             text_paddings.append(heading_padding)
 
         if description:
-            description_font_obj = load_font(description_font, description_size)
-            description_lines = self.wrap_text(description, description_font_obj, max_width, draw)
+            description_font_obj = self.load_font(description_font, description_size)
+            description_lines = self.wrap_text(description, description_font_obj, max_width, draw, line_breaking)
             text_blocks.append({
                 'lines': description_lines,
                 'font': description_font_obj,
-                'color': parse_color(description_color),
+                'color': self.parse_color(description_color),
                 'font_size': description_size
             })
             text_paddings.append(description_padding)
 
         if author:
-            author_font_obj = load_font(author_font, author_size)
+            author_font_obj = self.load_font(author_font, author_size)
             author_lines = [author]  # Author text doesn't need wrapping
             text_blocks.append({
                 'lines': author_lines,
                 'font': author_font_obj,
-                'color': parse_color(author_color),
+                'color': self.parse_color(author_color),
                 'font_size': author_size
             })
             text_paddings.append(author_padding)
@@ -198,16 +204,10 @@ class TextOverlay:
         else:  # bottom
             current_y = img_height - total_height - margin - boundary_padding
 
-        # Create two separate layers - one for shadow and one for text
-        shadow_layer = Image.new('RGBA', image_pil.size, (0, 0, 0, 0))
-        text_layer = Image.new('RGBA', image_pil.size, (0, 0, 0, 0))
-        shadow_draw = ImageDraw.Draw(shadow_layer)
-        text_draw = ImageDraw.Draw(text_layer)
-
-        # Draw all text blocks
+        placed_lines = []
         for i, block in enumerate(text_blocks):
             for line in block['lines']:
-                line_width = draw.textlength(line, font=block['font'])
+                line_width = shaped_runs.text_length(draw, line, block['font'])
                 
                 # Calculate x position based on alignment
                 if horizontal_align == "left":
@@ -216,34 +216,219 @@ class TextOverlay:
                     x = (img_width - line_width) // 2
                 else:  # right
                     x = img_width - line_width - margin
-                
-                # Draw text shadow if enabled
-                if shadow_enabled == "Yes":
-                    # Draw shadow with offset
-                    shadow_draw.text(
-                        (x + shadow_offset, current_y + shadow_offset), 
-                        line, 
-                        fill=shadow_rgba, 
-                        font=block['font']
-                    )
-                
-                # Draw main text
-                text_draw.text(
-                    (x, current_y), 
-                    line, 
-                    fill=block['color'] + (255,),
-                    font=block['font']
-                )
-                
+
+                placed_lines.append((x, current_y, line, block['font'], block['color']))
                 current_y += block['font_size'] + line_spacing
             
             # Add padding between text blocks
             if i < len(text_blocks) - 1:
                 current_y += text_paddings[i]
+
+        return placed_lines
+
+    def render_layers(self, size, placed_lines, shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur,
+                      draft=False):
+        """Draws the laid out lines into separate, transparent shadow and text layers of the given size"""
+        # Parse shadow color with opacity
+        shadow_rgb = self.parse_color(shadow_color)
+        shadow_rgba = (shadow_rgb[0], shadow_rgb[1], shadow_rgb[2], shadow_opacity)
+
+        # Create two separate layers - one for shadow and one for text
+        shadow_layer = Image.new('RGBA', size, (0, 0, 0, 0))
+        text_layer = Image.new('RGBA', size, (0, 0, 0, 0))
+        shadow_draw = ImageDraw.Draw(shadow_layer)
+        text_draw = ImageDraw.Draw(text_layer)
+
+        # Draw all text blocks
+        for x, y, line, font, color in placed_lines:
+            # Draw text shadow if enabled
+            if shadow_enabled == "Yes":
+                # Draw shadow with offset
+                shaped_runs.draw_text(
+                    shadow_draw,
+                    (x + shadow_offset, y + shadow_offset), 
+                    line, 
+                    fill=shadow_rgba, 
+                    font=font
+                )
+            
+            # Draw main text
+            shaped_runs.draw_text(
+                text_draw,
+                (x, y), 
+                line, 
+                fill=color + (255,),
+                font=font
+            )
         
         # Apply blur to shadow layer if enabled
         if shadow_enabled == "Yes" and shadow_blur > 0:
-            shadow_layer = shadow_layer.filter(ImageFilter.GaussianBlur(radius=shadow_blur))
+            # A single box blur pass is close enough for previews and much cheaper
+            blur = ImageFilter.BoxBlur(shadow_blur) if draft else ImageFilter.GaussianBlur(radius=shadow_blur)
+            shadow_layer = shadow_layer.filter(blur)
+
+        return shadow_layer, text_layer
+
+    def text_bbox(self, placed_lines, shadow_enabled, shadow_offset, shadow_blur):
+        """Returns the (left, top, right, bottom) area touched by the text, its shadow and the shadow blur"""
+        boxes = []
+        for x, y, line, font, _ in placed_lines:
+            left, top, right, bottom = shaped_runs.text_bbox(font, line)
+            boxes.append((x + left, y + top, x + right, y + bottom))
+            if shadow_enabled == "Yes":
+                boxes.append((x + left + shadow_offset, y + top + shadow_offset,
+                              x + right + shadow_offset, y + bottom + shadow_offset))
+
+        bbox = union_bbox(boxes)
+        if bbox is None:
+            return None
+        spread = 3 * shadow_blur + 2 if shadow_enabled == "Yes" else 2
+        return (bbox[0] - spread, bbox[1] - spread, bbox[2] + spread, bbox[3] + spread)
+
+    def render_sprite(self, size, placed_lines, shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur):
+        """
+        Renders the whole caption block once as a premultiplied RGBA sprite.
+
+        Returns:
+        - tuple: (sprite, x, y) where sprite is a float32 (H, W, 4) tensor cropped to the
+          visible caption, or None if nothing is visible, and x, y its top-left corner.
+        """
+        shadow_layer, text_layer = self.render_layers(
+            size, placed_lines, shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur
+        )
+        caption = Image.alpha_composite(shadow_layer, text_layer)
+        bbox = caption.getbbox()
+        if bbox is None:
+            return None, 0, 0
+
+        sprite = torch.from_numpy(np.array(caption.crop(bbox)).astype(np.float32) / 255.0)
+        sprite[..., :3] *= sprite[..., 3:]
+        return sprite, bbox[0], bbox[1]
+
+    def scale_lines(self, placed_lines, scale):
+        """Scales laid out lines and their fonts, keeping the line breaks and positions of the full size layout"""
+        scaled_lines = []
+        for x, y, line, font, color in placed_lines:
+            if not isinstance(font, ImageFont.FreeTypeFont):
+                # Bitmap fonts (load_default on older Pillow) only come in one size
+                scaled_lines.append((x * scale, y * scale, line, font, color))
+                continue
+            size = max(1, round(font.size * scale))
+            if isinstance(font.path, str):
+                scaled_font = load_truetype(font.path, size)
+            else:
+                scaled_font = font.font_variant(size=size)
+            scaled_lines.append((x * scale, y * scale, line, scaled_font, color))
+        return scaled_lines
+
+    def render_draft(self, image, placed_lines, scale, shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur):
+        """Composites the full size layout onto a downscaled proxy of every frame"""
+        img_height, img_width = image.shape[1], image.shape[2]
+        proxy_size = (max(1, round(img_width * scale)), max(1, round(img_height * scale)))
+        proxy = torch.nn.functional.interpolate(
+            image.movedim(-1, 1), size=(proxy_size[1], proxy_size[0]), mode="area"
+        ).movedim(1, -1)
+
+        # The layers only depend on the layout, render them once for the whole batch
+        shadow_layer, text_layer = self.render_layers(
+            proxy_size, self.scale_lines(placed_lines, scale), shadow_enabled, shadow_offset * scale,
+            shadow_color, shadow_opacity, shadow_blur * scale, draft=True
+        )
+
+        frames = []
+        for frame_np in proxy.cpu().numpy():
+            image_pil = Image.fromarray((frame_np * 255).astype(np.uint8)).convert('RGBA')
+            image_pil = Image.alpha_composite(image_pil, shadow_layer)
+            image_pil = Image.alpha_composite(image_pil, text_layer)
+            frames.append(torch.tensor(np.array(image_pil.convert('RGB')).astype(np.float32) / 255.0))
+        return torch.stack(frames)
+
+    def overlay_text(
+        self, image, 
+        heading, heading_font, heading_size, heading_color,
+        description, description_font, description_size, description_color,
+        author, author_font, author_size, author_color,
+        horizontal_align, vertical_position, margin_percent, line_spacing, width_percent,
+        heading_padding, description_padding, author_padding, boundary_padding,
+        shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur,
+        line_breaking="greedy", use_cache=False, sprite_mode=False, tiling="auto", workers=0, draft_scale=1.0
+    ):
+        if use_cache:
+            params = {k: v for k, v in locals().items() if k not in ("self", "image", "use_cache")}
+            return render_cache.cached(self.NAME(), image, params, lambda: self.overlay_text(image, **params))
+
+        if workers > 0 and not sprite_mode and draft_scale >= 1.0:
+            params = {k: v for k, v in locals().items() if k not in ("self", "image", "use_cache", "workers")}
+            return (render_batch(type(self), image, params, workers),)
+
+        layout_args = (
+            heading, heading_font, heading_size, heading_color,
+            description, description_font, description_size, description_color,
+            author, author_font, author_size, author_color,
+            horizontal_align, vertical_position, margin_percent, line_spacing, width_percent,
+            heading_padding, description_padding, author_padding, boundary_padding,
+            line_breaking,
+        )
+        shadow_args = (shadow_enabled, shadow_offset, shadow_color, shadow_opacity, shadow_blur)
+
+        if draft_scale < 1.0:
+            # Lay out at full size so positions match the final render, rasterize on a small proxy
+            img_height, img_width = image.shape[1], image.shape[2]
+            draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+            placed_lines = self.layout_text(img_width, img_height, draw, *layout_args)
+            return (self.render_draft(image, placed_lines, draft_scale, *shadow_args),)
+
+        if sprite_mode:
+            # Lay out and rasterize the caption once, then stamp it onto every frame
+            img_height, img_width = image.shape[1], image.shape[2]
+            draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+            placed_lines = self.layout_text(img_width, img_height, draw, *layout_args)
+            sprite, x, y = self.render_sprite((img_width, img_height), placed_lines, *shadow_args)
+
+            image_tensor_out = image.clone()
+            if sprite is not None:
+                sprite = sprite.to(image_tensor_out.device)
+                h, w = sprite.shape[0], sprite.shape[1]
+                region = image_tensor_out[:, y:y + h, x:x + w, :3]
+                region.mul_(1.0 - sprite[..., 3:]).add_(sprite[..., :3])
+            return (image_tensor_out,)
+
+        img_height, img_width = image.shape[1], image.shape[2]
+        if use_tiling(tiling, image):
+            # Only the tiles under the text are converted, the rest of the frame is passed through as is
+            draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+            placed_lines = self.layout_text(img_width, img_height, draw, *layout_args)
+            region = tile_region(
+                self.text_bbox(placed_lines, shadow_enabled, shadow_offset, shadow_blur), img_width, img_height
+            )
+            if region is None:
+                return (image,)
+
+            left, top, right, bottom = region
+            shifted_lines = [(x - left, y - top, line, font, color) for x, y, line, font, color in placed_lines]
+            shadow_layer, text_layer = self.render_layers((right - left, bottom - top), shifted_lines, *shadow_args)
+            region_pils = []
+            for index in range(image.shape[0]):
+                region_pil = Image.alpha_composite(crop_to_pil(image, region, index), shadow_layer)
+                region_pils.append(Image.alpha_composite(region_pil, text_layer))
+            return (paste_region(image, region_pils, region),)
+
+        # Convert tensor to PIL Image
+        image_tensor = image
+        image_np = image_tensor.cpu().numpy()
+        image_pil = Image.fromarray((image_np.squeeze(0) * 255).astype(np.uint8))
+        
+        # Create an RGBA version for alpha blending if needed
+        if image_pil.mode != 'RGBA':
+            image_pil = image_pil.convert('RGBA')
+        
+        draw = ImageDraw.Draw(image_pil)
+
+        # Get image dimensions
+        img_width, img_height = image_pil.size
+
+        placed_lines = self.layout_text(img_width, img_height, draw, *layout_args)
+        shadow_layer, text_layer = self.render_layers(image_pil.size, placed_lines, *shadow_args)
         
         # Composite the layers: first shadow, then text
         image_pil = Image.alpha_composite(image_pil, shadow_layer)
@@ -255,4 +440,4 @@ class TextOverlay:
         # Convert back to tensor
         image_tensor_out = torch.tensor(np.array(image_pil).astype(np.float32) / 255.0)
         image_tensor_out = torch.unsqueeze(image_tensor_out, 0)
-        return (image_tensor_out,) 
\ No newline at end of file
+        return (image_tensor_out,) 
@@ -0,0 +1,77 @@
+import numpy as np
+import torch
+from PIL import Image
+
+TILING_MODES = ["auto", "enabled", "disabled"]
+TILE_SIZE = 512
+# "auto" switches to tiled processing above roughly 16 megapixels (8K upscales and larger)
+AUTO_TILING_PIXELS = 4096 * 4096
+
+
+def use_tiling(tiling, image):
+    """Whether to take the tiled path for this (B, H, W, C) image, only RGB frames can be tiled"""
+    if image.shape[-1] != 3:
+        # The untiled path converts other channel counts to RGB, tiles would keep them
+        return False
+    if tiling == "enabled":
+        return True
+    if tiling == "auto":
+        return image.shape[1] * image.shape[2] > AUTO_TILING_PIXELS
+    return False
+
+
+def union_bbox(boxes):
+    """Returns the (left, top, right, bottom) box enclosing all given boxes, or None if there are none"""
+    boxes = list(boxes)
+    if not boxes:
+        return None
+    return (
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes),
+    )
+
+
+def tile_region(bbox, img_width, img_height, tile_size=TILE_SIZE):
+    """
+    Snaps a bounding box outwards to the tile grid and clips it to the image.
+
+    Returns:
+    - tuple: (left, top, right, bottom) covering every tile the box intersects, or
+      None if the box lies completely outside the image.
+    """
+    if bbox is None:
+        return None
+    left = max(0, int(np.floor(bbox[0] / tile_size)) * tile_size)
+    top = max(0, int(np.floor(bbox[1] / tile_size)) * tile_size)
+    right = min(img_width, int(np.ceil(bbox[2] / tile_size)) * tile_size)
+    bottom = min(img_height, int(np.ceil(bbox[3] / tile_size)) * tile_size)
+    if left >= right or top >= bottom:
+        return None
+    return left, top, right, bottom
+
+
+def crop_to_pil(image, region, index=0):
+    """Converts only the given region of one frame to an RGBA PIL image"""
+    left, top, right, bottom = region
+    region_np = image[index, top:bottom, left:right].cpu().numpy()
+    return Image.fromarray((region_np * 255).astype(np.uint8)).convert('RGBA')
+
+
+def paste_region(image, region_pils, region):
+    """
+    Returns a copy of image with the region of every frame replaced, all other pixels are left untouched.
+
+    Parameters:
+    - image (torch.Tensor): (B, H, W, C) batch.
+    - region_pils (list): One PIL image per frame, in batch order.
+    - region (tuple): (left, top, right, bottom) the images are pasted into.
+    """
+    left, top, right, bottom = region
+    image_tensor_out = image.clone()
+    for index, region_pil in enumerate(region_pils):
+        image_tensor_out[index, top:bottom, left:right] = torch.from_numpy(
+            np.array(region_pil.convert('RGB')).astype(np.float32) / 255.0
+        ).to(image_tensor_out.device)
+    return image_tensor_out